@@ -1,5 +1,7 @@
 import os
 import json
+import re
+import sys
 import time
 from groq import Groq
 
@@ -8,18 +10,17 @@ client = Groq(
     api_key=os.environ.get("GROQ_API_KEY", "")
 )
 
-def analyze_sentiment_for_company(company_data, ticker):
+MODEL_NAME = "llama-3.3-70b-versatile"
+
+def build_sentiment_messages(company_data, ticker):
     """
-    Analyze sentiment for a single company by sending URLs directly to the LLM
+    Build the chat messages used to score a single company
+
+    Returns:
+        tuple: (messages, article_info) - messages is None if no valid articles were found
     """
-    # Get article details
     articles = company_data.get('article_details', [])
     
-    if not articles:
-        return {"ticker": ticker, "sentiment_score": 0, "articles_analyzed": 0}
-    
-    print(f"  📰 Sending {len(articles)} article URLs to LLM for analysis...")
-    
     # Prepare URLs and headlines for the LLM to analyze
     article_info = []
     for i, article in enumerate(articles[:15], 1):  # Limit to first 15 articles
@@ -36,8 +37,7 @@ def analyze_sentiment_for_company(company_data, ticker):
             })
     
     if not article_info:
-        print(f"  ❌ No valid articles found for {ticker}")
-        return {"ticker": ticker, "sentiment_score": 0, "articles_analyzed": 0}
+        return None, article_info
     
     # Create the comprehensive prompt for LLM web analysis
     articles_list = []
@@ -82,12 +82,10 @@ Please visit each URL, read the full article content, and provide a comprehensiv
 Return only the final sentiment score as a single integer.
 """
 
-    try:
-        chat_completion = client.chat.completions.create(
-            messages=[
-                {
-                    "role": "system",
-                    "content": """You are an expert financial news sentiment analyst with web browsing capabilities. You can visit URLs and read complete article content to perform comprehensive sentiment analysis.
+    messages = [
+        {
+            "role": "system",
+            "content": """You are an expert financial news sentiment analyst with web browsing capabilities. You can visit URLs and read complete article content to perform comprehensive sentiment analysis.
 
 ANALYSIS METHODOLOGY:
 1. Visit each provided URL and read the complete article content
@@ -114,29 +112,56 @@ Examples:
 - "Meta to present at annual tech conference" → 0
 
 IMPORTANT: Visit each URL, read the full article content, and return only a single integer from -10 to +10."""
-                },
-                {
-                    "role": "user",
-                    "content": user_content
-                }
-            ],
-            model="llama-3.3-70b-versatile",
+        },
+        {
+            "role": "user",
+            "content": user_content
+        }
+    ]
+    
+    return messages, article_info
+
+def parse_sentiment_score(response_text):
+    """
+    Extract the sentiment score from the LLM response, clamped to -10..+10
+    """
+    # Try to extract just the sentiment score from the response
+    response_text = (response_text or "").strip()
+    
+    # Look for a number between -10 and 10
+    score_match = re.search(r'[+-]?\d+', response_text)
+    if score_match:
+        score = int(score_match.group())
+        # Clamp between -10 and 10
+        return max(-10, min(10, score))
+    return 0
+
+def analyze_sentiment_for_company(company_data, ticker):
+    """
+    Analyze sentiment for a single company by sending URLs directly to the LLM
+    """
+    # Get article details
+    articles = company_data.get('article_details', [])
+    
+    if not articles:
+        return {"ticker": ticker, "sentiment_score": 0, "articles_analyzed": 0}
+    
+    print(f"  📰 Sending {len(articles)} article URLs to LLM for analysis...")
+    
+    messages, article_info = build_sentiment_messages(company_data, ticker)
+    
+    if messages is None:
+        print(f"  ❌ No valid articles found for {ticker}")
+        return {"ticker": ticker, "sentiment_score": 0, "articles_analyzed": 0}
+
+    try:
+        chat_completion = client.chat.completions.create(
+            messages=messages,
+            model=MODEL_NAME,
         )
         
-        response_text = chat_completion.choices[0].message.content.strip()
-        
-        # Try to extract just the sentiment score from the response
-        response_text = response_text.strip()
-        
-        # Look for a number between -10 and 10
-        import re
-        score_match = re.search(r'[+-]?\d+', response_text)
-        if score_match:
-            score = int(score_match.group())
-            # Clamp between -10 and 10
-            score = max(-10, min(10, score))
-        else:
-            score = 0
+        response_text = chat_completion.choices[0].message.content
+        score = parse_sentiment_score(response_text)
             
         print(f"  🤖 LLM analyzed {len(article_info)} articles and returned score: {score:+d}")
             
@@ -200,8 +225,13 @@ def process_earnings_sentiment(json_filename="earnings_news_urls.json"):
         # Add delay to be respectful to APIs
         time.sleep(2)
     
+    return save_sentiment_results(earnings_data, sentiment_results)
+
+def save_sentiment_results(earnings_data, sentiment_results, output_filename="earnings_sentiment_analysis.json", partial=False):
+    """
+    Save sentiment results to file and print the analysis summary
+    """
     # Save results to file
-    output_filename = "earnings_sentiment_analysis.json"
     output_data = {
         "analysis_date": earnings_data.get('generated_at'),
         "earnings_week": earnings_data.get('earnings_week'),
@@ -209,6 +239,9 @@ def process_earnings_sentiment(json_filename="earnings_news_urls.json"):
         "sentiment_results": sentiment_results
     }
     
+    if partial:
+        output_data["partial"] = True
+    
     with open(output_filename, 'w', encoding='utf-8') as f:
         json.dump(output_data, f, indent=2, ensure_ascii=False)
     
@@ -249,41 +282,270 @@ def process_earnings_sentiment(json_filename="earnings_news_urls.json"):
     
     return {result['ticker']: result for result in sentiment_results}
 
-if __name__ == "__main__":
+def write_batch_requests(companies, requests_filename="sentiment_batch_requests.jsonl"):
     """
-    Test the Groq API with a simple example first
+    Write one chat completion request per company with articles into a JSONL batch file
+    
+    Args:
+        companies (dict): Companies from the earnings JSON file, keyed by ticker
+        requests_filename (str): Path of the JSONL request file to write
+    
+    Returns:
+        dict: Placeholder result for every ticker, keyed by ticker (neutral until the batch returns)
     """
-    print("Testing Groq API connection...")
+    placeholder_results = {}
+    request_count = 0
     
-    try:
-        # Test API connection
-        test_completion = client.chat.completions.create(
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a helpful assistant."
-                },
-                {
-                    "role": "user",
-                    "content": "Explain the importance of fast language models in one sentence.",
+    with open(requests_filename, 'w', encoding='utf-8') as f:
+        for ticker, company_data in companies.items():
+            articles = company_data.get('article_details', [])
+            messages = None
+            article_info = []
+            
+            if company_data.get('article_count', 0) > 0:
+                messages, article_info = build_sentiment_messages(company_data, ticker)
+            
+            placeholder_results[ticker] = {
+                "ticker": ticker,
+                "sentiment_score": 0,
+                "articles_analyzed": 0,
+                "total_articles_available": len(articles)
+            }
+            
+            if messages is None:
+                continue
+            
+            # Remember how many articles went into the prompt so results can report it
+            placeholder_results[ticker]["articles_analyzed"] = len(article_info)
+            
+            request = {
+                "custom_id": ticker,
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {
+                    "model": MODEL_NAME,
+                    "messages": messages
                 }
-            ],
-            model="llama-3.3-70b-versatile",
-        )
+            }
+            f.write(json.dumps(request, ensure_ascii=False) + "\n")
+            request_count += 1
+    
+    print(f"📝 Wrote {request_count} batch requests to '{requests_filename}'")
+    
+    return placeholder_results
+
+def submit_sentiment_batch(requests_filename="sentiment_batch_requests.jsonl", completion_window="24h"):
+    """
+    Upload the JSONL request file and create an asynchronous batch job
+    
+    Returns:
+        str: The batch job ID
+    """
+    with open(requests_filename, 'rb') as f:
+        batch_file = client.files.create(file=f, purpose="batch")
+    
+    batch = client.batches.create(
+        completion_window=completion_window,
+        endpoint="/v1/chat/completions",
+        input_file_id=batch_file.id,
+    )
+    
+    print(f"🚀 Submitted batch {batch.id} (input file {batch_file.id})")
+    
+    return batch.id
+
+def wait_for_batch(batch_id, poll_interval=30, timeout=None):
+    """
+    Poll a batch job until it reaches a final state
+    
+    Args:
+        batch_id (str): The batch job ID
+        poll_interval (int): Seconds to wait between status checks
+        timeout (int): Maximum seconds to wait, or None to wait indefinitely
+    
+    Returns:
+        Batch: The finished batch job
+    """
+    final_statuses = {"completed", "failed", "expired", "cancelled"}
+    start_time = time.monotonic()
+    
+    while True:
+        batch = client.batches.retrieve(batch_id)
+        print(f"  ⏳ Batch {batch_id} status: {batch.status}")
         
-        print("✅ Groq API connection successful!")
-        print(f"Response: {test_completion.choices[0].message.content}")
-        print()
+        if batch.status in final_statuses:
+            return batch
         
-    except Exception as e:
-        print(f"❌ Error connecting to Groq API: {e}")
-        print("Please check your API key and internet connection.")
-        exit(1)
+        if timeout is not None and time.monotonic() - start_time > timeout:
+            # Cancel the job so it does not keep running (and billing) after we give up
+            try:
+                client.batches.cancel(batch_id)
+            except Exception as e:
+                raise TimeoutError(f"Batch {batch_id} did not finish within {timeout} seconds and could not be cancelled: {e}")
+            raise TimeoutError(f"Batch {batch_id} did not finish within {timeout} seconds and was cancelled")
+        
+        time.sleep(poll_interval)
+
+def iter_batch_file(file_id):
+    """
+    Stream a batch output or error file line by line
+    """
+    with client.files.with_streaming_response.content(file_id) as response:
+        for line in response.iter_lines():
+            if line.strip():
+                yield line
+
+def read_batch_results(output_file_id, error_file_id, placeholder_results):
+    """
+    Stream the batch output and error files and merge the scores into the placeholder results
+    
+    Returns:
+        list: Sentiment results in the original ticker order
+    """
+    results = {ticker: dict(result) for ticker, result in placeholder_results.items()}
+    scored = set()
+    failed = set()
+    
+    if output_file_id:
+        for line in iter_batch_file(output_file_id):
+            ticker = None
+            try:
+                entry = json.loads(line)
+                ticker = entry.get('custom_id')
+                if ticker not in results:
+                    continue
+                
+                response_data = entry.get('response') or {}
+                if entry.get('error') or response_data.get('status_code') != 200:
+                    raise ValueError(entry.get('error') or f"HTTP {response_data.get('status_code')}")
+                
+                response_text = response_data['body']['choices'][0]['message']['content']
+                if not response_text:
+                    raise ValueError("empty response content")
+                
+                results[ticker]["sentiment_score"] = parse_sentiment_score(response_text)
+                scored.add(ticker)
+                
+            except Exception as e:
+                print(f"  ❌ Error analyzing {ticker or 'unknown ticker'}: {str(e)}")
+                if ticker in results:
+                    failed.add(ticker)
+    
+    # Requests that failed outright are reported in the separate error file
+    if error_file_id:
+        for line in iter_batch_file(error_file_id):
+            try:
+                entry = json.loads(line)
+            except ValueError as e:
+                print(f"  ❌ Unreadable line in batch error file: {str(e)}")
+                continue
+            
+            ticker = entry.get('custom_id')
+            if ticker in results and ticker not in scored and ticker not in failed:
+                print(f"  ❌ Error analyzing {ticker}: {entry.get('error') or entry.get('response')}")
+                failed.add(ticker)
+    
+    # Requests with no usable output fall back to a neutral score, as in live mode
+    for ticker, result in results.items():
+        if ticker in scored:
+            continue
+        if result["articles_analyzed"] > 0 and ticker not in failed:
+            print(f"  ❌ Error analyzing {ticker}: no result returned by batch")
+        result["sentiment_score"] = 0
+        result["articles_analyzed"] = 0
+    
+    return list(results.values())
+
+def process_earnings_sentiment_batch(json_filename="earnings_news_urls.json",
+                                     requests_filename="sentiment_batch_requests.jsonl",
+                                     output_filename="earnings_sentiment_analysis.json",
+                                     poll_interval=30, timeout=None):
+    """
+    Process all companies through a single asynchronous batch job instead of
+    one interactive call per ticker.
+    
+    A failed or cancelled batch raises RuntimeError and leaves the existing
+    results file untouched. An expired batch saves whatever finished to a
+    separate partial results file.
+    """
+    print(f"Loading earnings data from {json_filename}...")
+    
+    with open(json_filename, 'r', encoding='utf-8') as f:
+        earnings_data = json.load(f)
+    
+    companies = earnings_data.get('companies', {})
+    print(f"Found {len(companies)} companies to analyze")
+    
+    placeholder_results = write_batch_requests(companies, requests_filename)
+    
+    # Nothing to submit if no company has valid articles, save neutral scores like live mode
+    if not any(result["articles_analyzed"] > 0 for result in placeholder_results.values()):
+        print("No companies with valid articles, skipping batch submission")
+        return save_sentiment_results(earnings_data, list(placeholder_results.values()), output_filename)
+    
+    batch_id = submit_sentiment_batch(requests_filename)
+    batch = wait_for_batch(batch_id, poll_interval=poll_interval, timeout=timeout)
+    
+    partial = batch.status == "expired"
+    if batch.status in ("failed", "cancelled") or (partial and not batch.output_file_id):
+        raise RuntimeError(f"Batch {batch_id} finished with status '{batch.status}', no results saved")
+    
+    sentiment_results = read_batch_results(batch.output_file_id, batch.error_file_id, placeholder_results)
+    
+    if partial:
+        # Keep the last complete run intact and write the partial run next to it
+        root, ext = os.path.splitext(output_filename)
+        output_filename = f"{root}_partial{ext}"
+        print(f"\n⚠️  Batch {batch_id} expired before finishing - saving PARTIAL results to '{output_filename}'")
+    
+    results = save_sentiment_results(earnings_data, sentiment_results, output_filename, partial=partial)
+    
+    if partial:
+        print(f"\n⚠️  PARTIAL RUN: batch {batch_id} expired, unfinished tickers were given a neutral score")
+    
+    return results
+
+if __name__ == "__main__":
+    """
+    Test the Groq API with a simple example first (skipped in batch mode)
+    """
+    batch_mode = "--batch" in sys.argv
+    
+    if not batch_mode:
+        print("Testing Groq API connection...")
+        
+        try:
+            # Test API connection
+            test_completion = client.chat.completions.create(
+                messages=[
+                    {
+                        "role": "system",
+                        "content": "You are a helpful assistant."
+                    },
+                    {
+                        "role": "user",
+                        "content": "Explain the importance of fast language models in one sentence.",
+                    }
+                ],
+                model=MODEL_NAME,
+            )
+            
+            print("✅ Groq API connection successful!")
+            print(f"Response: {test_completion.choices[0].message.content}")
+            print()
+            
+        except Exception as e:
+            print(f"❌ Error connecting to Groq API: {e}")
+            print("Please check your API key and internet connection.")
+            exit(1)
     
     # Process earnings sentiment analysis
     try:
         print("Starting earnings sentiment analysis...")
-        results = process_earnings_sentiment()
+        if batch_mode:
+            results = process_earnings_sentiment_batch()
+        else:
+            results = process_earnings_sentiment()
         print("\n🎉 Analysis completed successfully!")
         
     except FileNotFoundError:
@@ -0,0 +1,332 @@
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from groq import Groq
+
+import LLM
+
+
+def make_company(*headlines):
+    articles = [
+        {
+            "url": f"https://example.com/{i}",
+            "headline": headline,
+            "source": "Example",
+            "datetime": 0
+        }
+        for i, headline in enumerate(headlines)
+    ]
+    return {
+        "earnings_date": "2025-09-22",
+        "earnings_day": "Monday",
+        "article_count": len(articles),
+        "urls": [article["url"] for article in articles],
+        "article_details": articles
+    }
+
+
+def output_line(request, content):
+    return json.dumps({
+        "id": f"req-{request['custom_id']}",
+        "custom_id": request["custom_id"],
+        "response": {
+            "status_code": 200,
+            "body": {"choices": [{"message": {"role": "assistant", "content": content}}]}
+        },
+        "error": None
+    })
+
+
+class StandInBatchServer:
+    """
+    Minimal local stand-in for the Groq files and batches endpoints
+    """
+
+    def __init__(self):
+        self.statuses = ["completed"]
+        self.responder = lambda request: ("output", output_line(request, "+5"))
+        self.requests = []
+        self.files = {}
+        self.retrieve_count = 0
+        self.uploads = 0
+        self.cancelled = []
+
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def send_json(self, data):
+                body = json.dumps(data).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0))).decode()
+                if self.path == "/openai/v1/files":
+                    stand_in.uploads += 1
+                    stand_in.requests = [json.loads(line) for line in body.splitlines()
+                                         if line.startswith('{"custom_id"')]
+                    self.send_json(stand_in.file_object("file-input"))
+                elif self.path == "/openai/v1/batches":
+                    self.send_json(stand_in.batch_object("validating"))
+                elif self.path == "/openai/v1/batches/batch-1/cancel":
+                    stand_in.cancelled.append("batch-1")
+                    self.send_json(stand_in.batch_object("cancelling"))
+                else:
+                    self.send_error(404)
+
+            def do_GET(self):
+                content_match = re.fullmatch(r"/openai/v1/files/([^/]+)/content", self.path)
+                if self.path == "/openai/v1/batches/batch-1":
+                    stand_in.retrieve_count += 1
+                    status = stand_in.statuses.pop(0) if len(stand_in.statuses) > 1 else stand_in.statuses[0]
+                    self.send_json(stand_in.batch_object(status))
+                elif content_match and content_match.group(1) in stand_in.files:
+                    body = stand_in.files[content_match.group(1)].encode()
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/octet-stream")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                else:
+                    self.send_error(404)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def file_object(self, file_id):
+        return {"id": file_id, "object": "file", "bytes": 0, "created_at": 0,
+                "filename": "requests.jsonl", "purpose": "batch"}
+
+    def batch_object(self, status):
+        batch = {"id": "batch-1", "object": "batch", "endpoint": "/v1/chat/completions",
+                 "input_file_id": "file-input", "completion_window": "24h",
+                 "status": status, "created_at": 0,
+                 "output_file_id": None, "error_file_id": None}
+
+        if status in ("completed", "expired") and self.requests:
+            output, errors = [], []
+            for request in self.requests:
+                kind, line = self.responder(request)
+                if kind == "output":
+                    output.append(line)
+                elif kind == "error":
+                    errors.append(line)
+            if output:
+                self.files["file-output"] = "\n".join(output) + "\n"
+                batch["output_file_id"] = "file-output"
+            if errors:
+                self.files["file-errors"] = "\n".join(errors) + "\n"
+                batch["error_file_id"] = "file-errors"
+
+        return batch
+
+
+@pytest.fixture
+def stand_in(monkeypatch, tmp_path):
+    server = StandInBatchServer()
+    monkeypatch.setattr(LLM, "client", Groq(api_key="test", base_url=server.url, max_retries=0))
+    monkeypatch.chdir(tmp_path)
+    yield server
+    server.server.shutdown()
+
+
+@pytest.fixture
+def earnings_file(tmp_path):
+    earnings_data = {
+        "earnings_week": "2025-09-22 to 2025-09-28",
+        "generated_at": "2025-09-20T22:16:07",
+        "total_companies": 5,
+        "companies": {
+            "AAA": make_company("AAA beats estimates", "AAA raises guidance"),
+            "BBB": make_company(),
+            "CCC": make_company("CCC misses revenue"),
+            "DDD": make_company("DDD announces buyback"),
+            "EEE": make_company("EEE names new CEO")
+        }
+    }
+    path = tmp_path / "earnings_news_urls.json"
+    path.write_text(json.dumps(earnings_data), encoding="utf-8")
+    return path
+
+
+def load_results(path):
+    data = json.loads(path.read_text(encoding="utf-8"))
+    return data, {result["ticker"]: result for result in data["sentiment_results"]}
+
+
+def test_write_batch_requests(tmp_path):
+    companies = {
+        "AAA": make_company("AAA beats estimates", "AAA raises guidance"),
+        "BBB": make_company(),
+        "CCC": make_company("No headline")
+    }
+    requests_file = tmp_path / "requests.jsonl"
+
+    placeholders = LLM.write_batch_requests(companies, str(requests_file))
+
+    lines = requests_file.read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 1
+    request = json.loads(lines[0])
+    assert request["custom_id"] == "AAA"
+    assert request["method"] == "POST"
+    assert request["url"] == "/v1/chat/completions"
+    assert request["body"]["model"] == LLM.MODEL_NAME
+    assert [m["role"] for m in request["body"]["messages"]] == ["system", "user"]
+    assert "https://example.com/1" in request["body"]["messages"][1]["content"]
+
+    assert placeholders["AAA"]["articles_analyzed"] == 2
+    assert placeholders["BBB"] == {"ticker": "BBB", "sentiment_score": 0,
+                                   "articles_analyzed": 0, "total_articles_available": 0}
+    assert placeholders["CCC"]["articles_analyzed"] == 0
+
+
+def test_wait_for_batch_polls_until_final(stand_in):
+    stand_in.statuses = ["validating", "in_progress", "finalizing", "completed"]
+
+    batch = LLM.wait_for_batch("batch-1", poll_interval=0)
+
+    assert batch.status == "completed"
+    assert stand_in.retrieve_count == 4
+
+
+def test_wait_for_batch_timeout(stand_in):
+    stand_in.statuses = ["in_progress"]
+
+    with pytest.raises(TimeoutError, match="batch-1"):
+        LLM.wait_for_batch("batch-1", poll_interval=0, timeout=0)
+
+    assert stand_in.cancelled == ["batch-1"]
+
+
+def test_batch_run_merges_results(stand_in, earnings_file, tmp_path):
+    stand_in.statuses = ["in_progress", "completed"]
+    stand_in.responder = lambda request: ("output", output_line(request, {"AAA": "+7", "CCC": "-12", "DDD": "3", "EEE": "0"}[request["custom_id"]]))
+
+    results = LLM.process_earnings_sentiment_batch(str(earnings_file), poll_interval=0)
+
+    data, saved = load_results(tmp_path / "earnings_sentiment_analysis.json")
+    assert "partial" not in data
+    assert data["total_companies_analyzed"] == 5
+    assert [r["ticker"] for r in data["sentiment_results"]] == ["AAA", "BBB", "CCC", "DDD", "EEE"]
+    assert saved["AAA"] == {"ticker": "AAA", "sentiment_score": 7,
+                            "articles_analyzed": 2, "total_articles_available": 2}
+    assert saved["BBB"]["sentiment_score"] == 0
+    assert saved["CCC"]["sentiment_score"] == -10
+    assert saved["DDD"]["sentiment_score"] == 3
+    assert saved["EEE"]["sentiment_score"] == 0
+    assert saved["EEE"]["articles_analyzed"] == 1
+    assert results["AAA"]["sentiment_score"] == 7
+
+
+def test_batch_run_reports_failed_requests(stand_in, earnings_file, tmp_path, capsys):
+    def responder(request):
+        ticker = request["custom_id"]
+        if ticker == "AAA":
+            return "output", output_line(request, "+6")
+        if ticker == "CCC":
+            return "error", json.dumps({"custom_id": ticker, "response": None,
+                                        "error": {"code": "rate_limit", "message": "too many tokens"}})
+        if ticker == "DDD":
+            # DDD comes back with a 200 body that has no choices
+            return "output", json.dumps({"custom_id": ticker, "response": {"status_code": 200, "body": {}},
+                                         "error": None})
+        # EEE comes back with null message content
+        return "output", output_line(request, None)
+
+    stand_in.responder = responder
+
+    LLM.process_earnings_sentiment_batch(str(earnings_file), poll_interval=0)
+
+    _, saved = load_results(tmp_path / "earnings_sentiment_analysis.json")
+    assert saved["AAA"]["sentiment_score"] == 6
+    for ticker in ("CCC", "DDD", "EEE"):
+        assert saved[ticker]["sentiment_score"] == 0
+        assert saved[ticker]["articles_analyzed"] == 0
+
+    output = capsys.readouterr().out
+    assert "❌ Error analyzing CCC" in output
+    assert "too many tokens" in output
+    assert "❌ Error analyzing DDD" in output
+    assert "❌ Error analyzing EEE: empty response content" in output
+
+
+def test_batch_run_survives_invalid_output_line(stand_in, earnings_file, tmp_path, capsys):
+    def responder(request):
+        if request["custom_id"] == "CCC":
+            return "output", "{not json"
+        return "output", output_line(request, "+2")
+
+    stand_in.responder = responder
+
+    LLM.process_earnings_sentiment_batch(str(earnings_file), poll_interval=0)
+
+    _, saved = load_results(tmp_path / "earnings_sentiment_analysis.json")
+    assert saved["AAA"]["sentiment_score"] == 2
+    assert saved["DDD"]["sentiment_score"] == 2
+    assert saved["CCC"]["articles_analyzed"] == 0
+    assert "❌ Error analyzing CCC: no result returned by batch" in capsys.readouterr().out
+
+
+@pytest.mark.parametrize("status", ["failed", "cancelled"])
+def test_failed_batch_keeps_previous_results(stand_in, earnings_file, tmp_path, status):
+    previous = tmp_path / "earnings_sentiment_analysis.json"
+    previous.write_text('{"previous": true}', encoding="utf-8")
+    stand_in.statuses = ["in_progress", status]
+
+    with pytest.raises(RuntimeError, match=status):
+        LLM.process_earnings_sentiment_batch(str(earnings_file), poll_interval=0)
+
+    assert previous.read_text(encoding="utf-8") == '{"previous": true}'
+
+
+def test_expired_batch_saves_partial_results(stand_in, earnings_file, tmp_path, capsys):
+    previous = tmp_path / "earnings_sentiment_analysis.json"
+    previous.write_text('{"previous": true}', encoding="utf-8")
+    stand_in.statuses = ["in_progress", "expired"]
+    stand_in.responder = lambda request: (("output", output_line(request, "+4"))
+                                          if request["custom_id"] == "AAA" else (None, None))
+
+    LLM.process_earnings_sentiment_batch(str(earnings_file), poll_interval=0)
+
+    assert previous.read_text(encoding="utf-8") == '{"previous": true}'
+    data, saved = load_results(tmp_path / "earnings_sentiment_analysis_partial.json")
+    assert data["partial"] is True
+    assert saved["AAA"]["sentiment_score"] == 4
+    assert saved["DDD"]["articles_analyzed"] == 0
+    assert "PARTIAL" in capsys.readouterr().out
+
+
+def test_expired_batch_without_output_raises(stand_in, earnings_file, tmp_path):
+    stand_in.statuses = ["expired"]
+    stand_in.responder = lambda request: (None, None)
+
+    with pytest.raises(RuntimeError, match="expired"):
+        LLM.process_earnings_sentiment_batch(str(earnings_file), poll_interval=0)
+
+    assert not (tmp_path / "earnings_sentiment_analysis.json").exists()
+
+
+def test_batch_run_without_requests_saves_neutral_results(stand_in, tmp_path):
+    earnings_file = tmp_path / "earnings_news_urls.json"
+    earnings_file.write_text(json.dumps({
+        "earnings_week": "2025-09-22 to 2025-09-28",
+        "generated_at": "2025-09-20T22:16:07",
+        "companies": {"XXX": {"article_count": 0}, "YYY": make_company("No headline")}
+    }), encoding="utf-8")
+
+    LLM.process_earnings_sentiment_batch(str(earnings_file), poll_interval=0)
+
+    assert stand_in.uploads == 0
+    data, saved = load_results(tmp_path / "earnings_sentiment_analysis.json")
+    assert data["total_companies_analyzed"] == 2
+    assert all(r["sentiment_score"] == 0 and r["articles_analyzed"] == 0 for r in saved.values())